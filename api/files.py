@@ -6,11 +6,26 @@ from datetime import datetime
 from core.supabase_create import get_supabase_admin
 from schemas.files import FileResponse, MarkdownResponse
 from api.auth import get_current_user
-from tasks.document_processor import process_document_task
+from tasks.document_processor import process_documents_batch
 from core.auth import verify_token
 
 router = APIRouter()
 
+def _queue_processing(queued_files: dict, raise_errors: bool = True):
+    """Dispatch processing for stored files in one batch (file_id -> filename)"""
+    if not queued_files:
+        return
+    try:
+        process_documents_batch(list(queued_files))
+    except Exception as e:
+        filenames = ", ".join(queued_files.values())
+        print(f"Failed to queue processing for {filenames}: {str(e)}")
+        if raise_errors:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to queue processing for {filenames}: {str(e)}"
+            )
+
 @router.post("/upload", response_model=List[FileResponse])
 async def upload_files(request: Request):
     """
@@ -125,6 +140,7 @@ async def upload_files(request: Request):
         )
     
     uploaded_files = []
+    queued_files = {}  # file_id -> filename, dispatched together after the loop
     
     # File validation (same as before)
     allowed_types = {
@@ -223,8 +239,8 @@ async def upload_files(request: Request):
                     detail=f"Failed to create file record: {db_response.error}"
                 )
             
-            # Queue document processing task
-            process_document_task.delay(file_id)
+            # Queue document processing task (dispatched as one batch below)
+            queued_files[file_id] = file.filename
             
             uploaded_files.append(FileResponse(
                 id=file_id,
@@ -244,14 +260,19 @@ async def upload_files(request: Request):
             print(f"Successfully processed file: {file.filename} -> folder: {folder_id or 'No folder'}")
             
         except HTTPException:
+            # Files stored before this failure still get processed; keep the original error
+            _queue_processing(queued_files, raise_errors=False)
             raise
         except Exception as e:
             print(f"File processing error for {file.filename}: {str(e)}")
+            _queue_processing(queued_files, raise_errors=False)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Failed to process {file.filename}: {str(e)}"
             )
     
+    _queue_processing(queued_files)
+    
     print(f"Upload completed successfully - {len(uploaded_files)} files processed")
     return uploaded_files
 
@@ -4,7 +4,7 @@ import uuid
 from datetime import datetime
 from core.supabase_create import get_supabase_admin
 from api.auth import get_current_user
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 import re
 
 router = APIRouter()
@@ -31,8 +31,7 @@ class FolderResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 def parse_datetime_safely(datetime_str: str) -> datetime:
     """Safely parse datetime string with flexible microsecond handling"""
@@ -929,7 +929,7 @@ async def create_review(
         background_tasks.add_task(
             create_review_async,
             review_id,
-            review_data.dict(),
+            review_data.model_dump(),
             file_ids,
             current_user.id
         )
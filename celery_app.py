@@ -1,6 +1,8 @@
 # celery_app.py - Updated version
 from celery import Celery
+from celery.signals import worker_process_init, worker_process_shutdown
 from core.config import settings
+from core.logging_config import start_queue_logging, stop_queue_logging
 import os
 
 # macOS-specific multiprocessing configuration
@@ -30,10 +32,15 @@ celery_app.conf.update(
     enable_utc=True,
     
     # Worker configuration
+    # Each prefork child loads its own Docling models; keep this within the container's memory limit
+    worker_concurrency=int(os.getenv('CELERY_WORKER_CONCURRENCY', '2')),
     worker_prefetch_multiplier=1,  # Important for memory-intensive tasks
     task_acks_late=True,
     worker_max_tasks_per_child=10,  # Restart workers after 10 tasks to prevent memory leaks
-    worker_max_memory_per_child=1024000,  # 1GB memory limit per worker
+    # Children keep the Docling models (~1GB) resident across tasks, so the cap must sit well
+    # above that or every child is recycled after each document. concurrency x cap must fit
+    # the worker container's memory limit in docker-compose.yml.
+    worker_max_memory_per_child=int(os.getenv('CELERY_MAX_MEMORY_PER_CHILD_KB', '2097152')),  # 2GB per worker
     
     # Task routing and execution
     task_default_queue='default',
@@ -43,7 +50,6 @@ celery_app.conf.update(
     # Retry configuration
     task_annotations={
         'tasks.document_processor.process_document_task': {
-            'rate_limit': '2/m',  # Max 2 tasks per minute to prevent overload
             'max_retries': 3,
             'default_retry_delay': 60,
         }
@@ -62,4 +68,13 @@ celery_app.conf.update(
     worker_disable_rate_limits=False,
     worker_hijack_root_logger=False,
     worker_log_color=True if os.getenv('CELERY_LOG_COLOR', '1') == '1' else False,
-)
\ No newline at end of file
+)
+
+# Queue-backed logging in each prefork child, after Celery has configured the root logger
+@worker_process_init.connect
+def _init_worker_logging(**kwargs):
+    start_queue_logging()
+
+@worker_process_shutdown.connect
+def _shutdown_worker_logging(**kwargs):
+    stop_queue_logging()
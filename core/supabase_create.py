@@ -1,6 +1,12 @@
 # core/supabase_create.py
 import httpx, asyncio
+import threading
+import time
+from functools import lru_cache
 from supabase import create_client, Client
+from postgrest.exceptions import APIError
+from storage3.utils import StorageException
+from tenacity import Retrying, stop_after_attempt, wait_exponential, retry_if_exception
 from core.config import settings
 
 _pool: httpx.AsyncClient | None = None
@@ -25,9 +31,93 @@ def get_supabase_client() -> Client:
 
 
 
-def get_supabase_admin() -> Client:             # service key
+@lru_cache(maxsize=1)
+def get_supabase_admin() -> Client:             # service key, shared per process
     sb = create_client(settings.supabase_url, settings.supabase_service_role_key)
     _patch_sessions(sb)
     return sb
 
-    
+
+# PostgREST could not reach or connect to the database
+_POSTGREST_CONNECTION_CODES = frozenset({"PGRST000", "PGRST001", "PGRST002", "PGRST003"})
+
+def _is_server_status(code) -> bool:
+    try:
+        return int(code) >= 500
+    except (TypeError, ValueError):
+        return False
+
+def _is_transient(exc: BaseException) -> bool:
+    """Transport failures and 5xx responses; client errors (4xx, constraint violations, missing objects) are not"""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= 500
+    if isinstance(exc, APIError):
+        # postgrest raises APIError for every non-2xx; non-JSON bodies (e.g. gateway 502s) carry the int status
+        return exc.code in _POSTGREST_CONNECTION_CODES or (isinstance(exc.code, int) and exc.code >= 500)
+    if isinstance(exc, StorageException):
+        detail = exc.args[0] if exc.args and isinstance(exc.args[0], dict) else {}
+        return _is_server_status(detail.get("statusCode"))
+    return isinstance(exc, httpx.TransportError)
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling Supabase while the circuit breaker is open"""
+
+class CircuitBreaker:
+    """Fails fast after sustained failures.
+
+    The lock only guards the breaker state, never the wrapped call, so
+    concurrent Supabase calls in one process don't serialize on it.
+    """
+
+    def __init__(self, fail_max: int, reset_timeout: float):
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: float | None = None
+
+    def call(self, fn, *args, **kwargs):
+        with self._lock:
+            if self._opened_at is not None:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    raise CircuitOpenError("Supabase circuit breaker is open")
+                # Half-open: let calls through, but one more failure reopens
+                self._opened_at = None
+                self._failures = self.fail_max - 1
+
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as exc:
+            if not _is_transient(exc):
+                # A bad row or missing object says nothing about Supabase's health
+                raise
+            with self._lock:
+                self._failures += 1
+                if self._failures >= self.fail_max:
+                    self._opened_at = time.monotonic()
+            raise
+
+        with self._lock:
+            self._failures = 0
+        return result
+
+# Opens after sustained failures so callers fail fast instead of waiting on timeouts
+supabase_breaker = CircuitBreaker(fail_max=5, reset_timeout=30)
+
+_RETRY_POLICY = dict(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential(multiplier=0.2, max=2),
+    reraise=True
+)
+
+def call_supabase(fn, *args, **kwargs):
+    """Run a Supabase call behind the shared circuit breaker, retrying transient failures.
+
+    Only wrap idempotent calls: a timeout after the server committed is retried.
+    """
+    retrying = Retrying(retry=retry_if_exception(_is_transient), **_RETRY_POLICY)
+    return retrying(supabase_breaker.call, fn, *args, **kwargs)
+
+def execute_with_retry(query):
+    """Execute a built PostgREST query through call_supabase"""
+    return call_supabase(query.execute)
@@ -3,65 +3,70 @@ from fastapi import FastAPI, status, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
-import json, uuid
-from fastapi.encoders import jsonable_encoder
+import uuid
+import orjson
 import google.generativeai as genai
-import traceback
+import logging
 from contextlib import asynccontextmanager
 import asyncio
 from api.tabular_review import cleanup_old_buffers, _redis_listener
+from core.logging_config import start_queue_logging, stop_queue_logging
 
-# ------------ custom JSONResponse to stringify UUIDs ------------
-class UUIDEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, uuid.UUID):
-            return str(obj)
-        return super().default(obj)
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
+# ------------ custom JSONResponse to stringify UUIDs ------------
 class UUIDJSONResponse(JSONResponse):
+    media_type = "application/json"
+
     def render(self, content: any) -> bytes:
-        return json.dumps(
-            jsonable_encoder(content),
-            cls=UUIDEncoder,
-            ensure_ascii=False,
-            allow_nan=False,
-            separators=(",", ":")
-        ).encode("utf-8")
+        # orjson handles UUID/datetime natively; str() covers anything else
+        return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS)
 
 # ------------ single FastAPI instantiation ------------
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Configure Gemini AI with environment variable
-    gemini_api_key = os.getenv("GEMINI_API_KEY")
-    if not gemini_api_key:
-        print("⚠️  WARNING: GEMINI_API_KEY not found in environment variables")
-        raise ValueError("GEMINI_API_KEY environment variable is required")
-    
-    genai.configure(api_key=gemini_api_key)
-    print("✅ Gemini AI configured")
-    
-    # Start background tasks with error handling
-    background_tasks = []
+    # Started per worker process: the listener thread would not survive gunicorn's --preload fork
+    start_queue_logging()
     try:
-        bg1 = asyncio.create_task(_redis_listener())
-        bg2 = asyncio.create_task(cleanup_old_buffers())
-        background_tasks = [bg1, bg2]
-        print("✅ Background listeners started")
-    except Exception as e:
-        print(f"❌ Failed to start background tasks: {e}")
-        raise
-    
-    yield  # Application is running
-    
-    # Cleanup on shutdown
-    print("🔄 Shutting down background tasks...")
-    for task in background_tasks:
-        task.cancel()
-    
-    if background_tasks:
-        await asyncio.gather(*background_tasks, return_exceptions=True)
-    print("✅ Background listeners stopped")
+        # Configure Gemini AI with environment variable
+        gemini_api_key = os.getenv("GEMINI_API_KEY")
+        if not gemini_api_key:
+            logger.warning("⚠️  GEMINI_API_KEY not found in environment variables")
+            raise ValueError("GEMINI_API_KEY environment variable is required")
+        
+        genai.configure(api_key=gemini_api_key)
+        logger.info("✅ Gemini AI configured")
+        
+        # Run new tasks eagerly until their first real suspension (Python 3.12+)
+        if hasattr(asyncio, "eager_task_factory"):
+            asyncio.get_running_loop().set_task_factory(asyncio.eager_task_factory)
+        
+        # Start background tasks with error handling
+        background_tasks = []
+        try:
+            bg1 = asyncio.create_task(_redis_listener())
+            bg2 = asyncio.create_task(cleanup_old_buffers())
+            background_tasks = [bg1, bg2]
+            logger.info("✅ Background listeners started")
+        except Exception as e:
+            logger.error("❌ Failed to start background tasks: %s", e)
+            raise
+        
+        yield  # Application is running
+        
+        # Cleanup on shutdown
+        logger.info("🔄 Shutting down background tasks...")
+        for task in background_tasks:
+            task.cancel()
+        
+        if background_tasks:
+            await asyncio.gather(*background_tasks, return_exceptions=True)
+        logger.info("✅ Background listeners stopped")
+    finally:
+        # Flush queued records and stop the listener on every exit path
+        stop_queue_logging()
 
 
 app = FastAPI(
@@ -74,15 +79,18 @@ app = FastAPI(
 
 
 # ------------ Exception handlers for better debugging ------------
+# Shared, never mutated: Starlette copies response headers into its own list
+_BEARER_HEADERS = {"WWW-Authenticate": "Bearer"}
+
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
     """Handle HTTP exceptions (including authentication errors)"""
-    print(f"HTTP {exc.status_code} error on {request.method} {request.url}: {exc.detail}")
+    logger.info("HTTP %s error on %s %s: %s", exc.status_code, request.method, request.url, exc.detail)
     
     # Ensure proper headers for authentication errors
-    headers = getattr(exc, 'headers', None) or {}
-    if exc.status_code == 401 and 'WWW-Authenticate' not in headers:
-        headers['WWW-Authenticate'] = 'Bearer'
+    headers = getattr(exc, 'headers', None)
+    if exc.status_code == 401 and (headers is None or 'WWW-Authenticate' not in headers):
+        headers = _BEARER_HEADERS if headers is None else {**headers, **_BEARER_HEADERS}
     
     return JSONResponse(
         status_code=exc.status_code,
@@ -97,7 +105,7 @@ async def http_exception_handler(request: Request, exc: HTTPException):
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     """Handle FastAPI validation errors (422)"""
-    print(f"Validation error on {request.method} {request.url}: {exc.errors()}")
+    logger.info("Validation error on %s %s: %s", request.method, request.url, exc.errors())
     
     # Get more details about the validation error
     error_details = []
@@ -109,7 +117,7 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
             "location": error.get("loc", [])
         })
     
-    print(f"Detailed validation errors: {error_details}")
+    logger.info("Detailed validation errors: %s", error_details)
     
     return JSONResponse(
         status_code=422,
@@ -125,8 +133,13 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 async def general_exception_handler(request: Request, exc: Exception):
     """Handle any other exceptions"""
     error_id = str(uuid.uuid4())
-    print(f"[{error_id}] Unexpected error on {request.method} {request.url}: {str(exc)}")
-    print(f"[{error_id}] Traceback: {traceback.format_exc()}")
+    # exc_info defers traceback formatting to the handler, skipped when ERROR is disabled
+    if logger.isEnabledFor(logging.ERROR):
+        logger.error(
+            "[%s] Unexpected error on %s %s: %s", error_id, request.method, request.url, exc,
+            extra={"error_id": error_id, "path": str(request.url)},
+            exc_info=exc
+        )
     
     return JSONResponse(
         status_code=500,
@@ -152,8 +165,8 @@ allowed_origins = os.getenv("ALLOWED_ORIGINS", "").split(",") if os.getenv("ALLO
     "http://frontend",
 ]
 
-# Filter out empty strings
-allowed_origins = [origin.strip() for origin in allowed_origins if origin.strip()]
+# Filter out empty strings; a frozenset dedupes and gives O(1) origin checks in CORSMiddleware
+allowed_origins = frozenset(origin.strip() for origin in allowed_origins if origin.strip())
 
 app.add_middleware(
     CORSMiddleware,
@@ -161,6 +174,7 @@ app.add_middleware(
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
     allow_credentials=True,
+    max_age=86400,  # Let browsers cache preflight responses for a day
 )
 
 # ------------ include your routers ------------
@@ -172,15 +186,18 @@ app.include_router(health.router, prefix="/api/health", tags=["health"])
 app.include_router(tabular_review.router, prefix="/api/reviews", tags=["reviews"])
 app.include_router(folder.router, prefix="/api/folders", tags=["folders"])
 
+# Static payload built once at import instead of on every request
+_ROOT_PAYLOAD = {
+    "message": "Document Processor API",
+    "version": "1.0.0",
+    "status": "healthy",
+    "docs": "/docs"
+}
+
 @app.get("/", tags=["root"])
 async def root():
     """Root endpoint with basic API information"""
-    return {
-        "message": "Document Processor API",
-        "version": "1.0.0",
-        "status": "healthy",
-        "docs": "/docs"
-    }
+    return _ROOT_PAYLOAD
 
 # ------------ run ------------
 if __name__ == "__main__":
@@ -190,5 +207,7 @@ if __name__ == "__main__":
         host="0.0.0.0", 
         port=8000, 
         reload=True,
+        loop="uvloop",
+        http="httptools",
         log_level="info"
     )
\ No newline at end of file
@@ -0,0 +1,6 @@
+-- Content hash of the source file, used to reuse markdown for byte-identical re-uploads
+ALTER TABLE markdown_content ADD COLUMN IF NOT EXISTS content_hash text;
+
+-- Lookups are scoped to the uploading user
+CREATE INDEX IF NOT EXISTS markdown_content_user_content_hash_idx
+    ON markdown_content (user_id, content_hash);
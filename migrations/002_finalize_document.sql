@@ -0,0 +1,50 @@
+-- Earlier non-idempotent inserts (and acks_late redeliveries) may have left several rows
+-- per file; keep the most recent one so the unique index below can be built.
+DELETE FROM markdown_content m
+USING (
+    SELECT id,
+           row_number() OVER (
+               PARTITION BY file_id
+               ORDER BY updated_at DESC NULLS LAST, created_at DESC NULLS LAST, id DESC
+           ) AS rn
+      FROM markdown_content
+) ranked
+WHERE m.id = ranked.id
+  AND ranked.rn > 1;
+
+-- One markdown row per file; lets finalize_document upsert so retried calls are idempotent
+CREATE UNIQUE INDEX IF NOT EXISTS markdown_content_file_id_key
+    ON markdown_content (file_id);
+
+-- Stores a document's markdown and marks its file completed in one transaction
+CREATE OR REPLACE FUNCTION finalize_document(
+    p_file_id uuid,
+    p_user_id uuid,
+    p_content text,
+    p_content_hash text,
+    p_words int,
+    p_finished_at timestamptz
+) RETURNS void AS $$
+    INSERT INTO markdown_content
+        (file_id, user_id, content, content_hash, word_count, created_at, updated_at)
+    VALUES
+        (p_file_id, p_user_id, p_content, p_content_hash, p_words, p_finished_at, p_finished_at)
+    ON CONFLICT (file_id) DO UPDATE
+        SET content = EXCLUDED.content,
+            content_hash = EXCLUDED.content_hash,
+            word_count = EXCLUDED.word_count,
+            updated_at = EXCLUDED.updated_at;
+
+    UPDATE files
+       SET status = 'completed',
+           processed_at = p_finished_at,
+           updated_at = p_finished_at,
+           error_message = NULL
+     WHERE id = p_file_id;
+$$ LANGUAGE sql;
+
+-- Only the backend's service role calls this; keep it out of the public /rest/v1/rpc surface
+REVOKE EXECUTE ON FUNCTION finalize_document(uuid, uuid, text, text, int, timestamptz)
+    FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION finalize_document(uuid, uuid, text, text, int, timestamptz)
+    TO service_role;
@@ -1,5 +1,5 @@
 # schemas/tabular_reviews.py
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 from enum import Enum
@@ -38,8 +38,7 @@ class TabularReviewColumnResponse(BaseModel):
     data_type: str
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class TabularReviewColumnUpdate(BaseModel):
     column_name: Optional[str] = Field(None, min_length=1, max_length=255)
@@ -56,28 +55,25 @@ class TabularReviewFileResponse(BaseModel):
     status: str
     added_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 # Review schemas
 class TabularReviewCreate(BaseModel):
     name: str = Field(..., min_length=1, max_length=255)
     description: Optional[str] = Field(None, max_length=1000)
-    columns: List[TabularReviewColumnCreate] = Field(..., min_items=1, max_items=20)
+    columns: List[TabularReviewColumnCreate] = Field(..., min_length=1, max_length=20)
     review_scope: ReviewScope = Field(default=ReviewScope.FILES)
-    file_ids: Optional[List[str]] = Field(None, max_items=100)
+    file_ids: Optional[List[str]] = Field(None, max_length=100)
     folder_id: Optional[str] = None
 
-    class Config:
-        use_enum_values = True
+    model_config = ConfigDict(use_enum_values=True)
 
 class TabularReviewUpdate(BaseModel):
     name: Optional[str] = Field(None, min_length=1, max_length=255)
     description: Optional[str] = Field(None, max_length=1000)
     status: Optional[ReviewStatus] = None
 
-    class Config:
-        use_enum_values = True
+    model_config = ConfigDict(use_enum_values=True)
 
 class TabularReviewResponse(BaseModel):
     id: str
@@ -96,8 +92,7 @@ class TabularReviewResponse(BaseModel):
     total_columns: int
     completion_percentage: float
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 # Result schemas
 class TabularReviewResultResponse(BaseModel):
@@ -109,8 +104,7 @@ class TabularReviewResultResponse(BaseModel):
     source_reference: Optional[str]
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class TabularReviewResultUpdate(BaseModel):
     extracted_value: Optional[str] = None
@@ -136,8 +130,7 @@ class TabularReviewDetailResponse(BaseModel):
     completion_percentage: float
     results: List[TabularReviewResultResponse]
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 # List response with pagination
 class TabularReviewListResponse(BaseModel):
@@ -147,8 +140,7 @@ class TabularReviewListResponse(BaseModel):
     page_size: int
     total_pages: int
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 # Analysis schemas
 class AnalysisRequest(BaseModel):
@@ -188,7 +180,7 @@ class SSEEvent(BaseModel):
 
 # File addition schemas
 class AddFilesToReviewRequest(BaseModel):
-    file_ids: List[str] = Field(..., min_items=1, max_items=50)
+    file_ids: List[str] = Field(..., min_length=1, max_length=50)
 
 class AddColumnToReviewRequest(BaseModel):
     column_name: str = Field(..., min_length=1, max_length=255)
@@ -1,22 +1,185 @@
-from celery import Celery
+from celery import Celery, group
 from docling.document_converter import DocumentConverter
-from docling.datamodel.base_models import InputFormat
+from docling.datamodel.base_models import InputFormat, DocumentStream
 from docling.datamodel.pipeline_options import PdfPipelineOptions
 from docling.document_converter import PdfFormatOption
 from docling.datamodel.accelerator_options import AcceleratorOptions, AcceleratorDevice
-from datetime import datetime
-from core.supabase_create import get_supabase_admin
+from datetime import datetime, timezone
+from core.supabase_create import get_supabase_admin, call_supabase, execute_with_retry
 from celery_app import celery_app
+from blake3 import blake3
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+import threading
+import logging
+import asyncio
+import multiprocessing
 import tempfile
+import httpx
+import io
 import os
+import re
+
+logger = logging.getLogger(__name__)
+
+# Configure Docling to use CPU (no MPS)
+# Few threads per converter: worker processes supply the parallelism across documents
+_accelerator_opts = AcceleratorOptions(
+    num_threads=2,
+    device=AcceleratorDevice.CPU
+)
+_pdf_opts = PdfPipelineOptions()
+_pdf_opts.accelerator_options = _accelerator_opts
+
+# Serializes conversions when the worker runs with --pool=threads
+_converter_lock = threading.Lock()
+
+@lru_cache(maxsize=1)
+def _get_converter() -> DocumentConverter:
+    """Build the Docling converter once per worker process so models load only once"""
+    return DocumentConverter(
+        format_options={
+            InputFormat.PDF: PdfFormatOption(pipeline_options=_pdf_opts)
+        }
+    )
+
+_WHITESPACE = re.compile(r"\s")
+
+def _count_words(text: str, chunk_size: int = 1 << 20) -> int:
+    """Count whitespace-separated words without building one list for the whole text"""
+    count = 0
+    start = 0
+    length = len(text)
+    while start < length:
+        end = start + chunk_size
+        if end < length:
+            # Extend the chunk to the next whitespace so no word is split across chunks
+            match = _WHITESPACE.search(text, end)
+            end = match.start() if match else length
+        count += len(text[start:end].split())
+        start = end
+    return count
+
+def _convert_source(source) -> str:
+    """Run Docling on a DocumentStream or file path and return the markdown"""
+    with _converter_lock:
+        result = _get_converter().convert(source)
+    return result.document.export_to_markdown()
+
+def _convert_bytes(pdf_bytes: bytes, name: str = "document.pdf") -> str:
+    """Run Docling on in-memory PDF bytes and return the markdown"""
+    return _convert_source(DocumentStream(name=name, stream=io.BytesIO(pdf_bytes)))
+
+# Docling inference is CPU-bound and holds the GIL for seconds per document.
+# Celery tasks already run it in prefork worker processes; code running on the
+# FastAPI event loop must go through convert_async() so the loop never blocks.
+def _init_worker():
+    _get_converter()
+
+@lru_cache(maxsize=1)
+def _get_process_pool() -> ProcessPoolExecutor:
+    # Spawn, not the global fork method: forking a running uvicorn worker would copy its
+    # event loop and threads, and leave children logging into a queue nobody drains
+    return ProcessPoolExecutor(
+        max_workers=int(os.getenv("DOCLING_WORKERS", "4")),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker
+    )
+
+async def convert_async(pdf_bytes: bytes, name: str = "document.pdf") -> str:
+    """Convert a PDF in the Docling process pool without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_process_pool(), _convert_bytes, pdf_bytes, name)
+
+# Downloads up to this size stay in memory; larger ones spill to a temp file
+_SPOOL_MAX_BYTES = 16 * 1024 * 1024
+
+@dataclass
+class _SpooledDownload:
+    source: DocumentStream | Path
+    content_hash: str
+    spill_path: str | None = None
+
+    def close(self):
+        if self.spill_path:
+            try:
+                os.unlink(self.spill_path)
+            except OSError as cleanup_error:
+                logger.warning("⚠️ Failed to cleanup temp file: %s", cleanup_error)
+
+@lru_cache(maxsize=1)
+def _get_http_client() -> httpx.Client:
+    return httpx.Client(timeout=60)
+
+def _download_to_spool(supa, storage_path: str, name: str) -> _SpooledDownload | None:
+    """Stream a storage object through a signed URL, hashing it as it arrives"""
+    signed = supa.storage.from_("documents").create_signed_url(storage_path, 60)
+    hasher = blake3()
+    buffer = io.BytesIO()
+    spill_file = None
+    try:
+        with _get_http_client().stream("GET", signed["signedURL"]) as response:
+            response.raise_for_status()
+            for chunk in response.iter_bytes():
+                hasher.update(chunk)
+                if spill_file is None and buffer.tell() + len(chunk) > _SPOOL_MAX_BYTES:
+                    spill_file = tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
+                    spill_file.write(buffer.getbuffer())
+                    buffer = None
+                if spill_file is not None:
+                    spill_file.write(chunk)
+                else:
+                    buffer.write(chunk)
+    except Exception:
+        if spill_file is not None:
+            spill_file.close()
+            os.unlink(spill_file.name)
+        raise
+
+    if spill_file is not None:
+        spill_file.close()
+        return _SpooledDownload(Path(spill_file.name), hasher.hexdigest(), spill_file.name)
+
+    if not buffer.tell():
+        return None
+    buffer.seek(0)
+    return _SpooledDownload(DocumentStream(name=name, stream=buffer), hasher.hexdigest())
+
+def _find_cached_markdown(supa, user_id: str, content_hash: str) -> dict | None:
+    """Find markdown this user already has for byte-identical content, or None.
+
+    Scoped to the user so completion time can't reveal other tenants' uploads,
+    and fails open to a normal conversion if the lookup itself errors.
+    """
+    try:
+        response = execute_with_retry(
+            supa.table("markdown_content")
+            .select("content, word_count")
+            .eq("user_id", user_id)
+            .eq("content_hash", content_hash)
+            .limit(1)
+        )
+    except Exception as e:
+        logger.warning("⚠️ Content hash lookup failed, converting normally: %s", e)
+        return None
+    return response.data[0] if response.data else None
+
+# Background pool for status writes that don't need to block the pipeline
+status_executor = ThreadPoolExecutor(max_workers=4)
+
+def _update_file(file_id: str, values: dict):
+    return execute_with_retry(get_supabase_admin().table("files").update(values).eq("id", file_id))
 
 @celery_app.task
 def process_document_task(file_id: str):
     try:
-        print(f"🔄 Starting document processing for file: {file_id}")
+        logger.info("🔄 Starting document processing for file: %s", file_id)
         
         # Get file record using service key
-        file_response = get_supabase_admin().table("files").select("*").eq("id", file_id).execute()
+        supa = get_supabase_admin()
+        file_response = execute_with_retry(supa.table("files").select("*").eq("id", file_id))
 
         if hasattr(file_response, 'error') and file_response.error:
             return {"status": "error", "message": "File not found"}
@@ -25,106 +188,97 @@ def process_document_task(file_id: str):
             return {"status": "error", "message": "File not found"}
 
         file_record = file_response.data[0]
+        t_start = datetime.now(timezone.utc).isoformat()
 
-        # Update status to processing
-        get_supabase_admin().table("files").update({
+        # Mark as processing in the background so download/conversion can start right away
+        processing_update = status_executor.submit(_update_file, file_id, {
             "status": "processing",
-            "updated_at": datetime.utcnow().isoformat()
-        }).eq("id", file_id).execute()
+            "updated_at": t_start
+        })
 
-        # Download file from Supabase Storage using service key
-        download_response = get_supabase_admin().storage.from_("documents").download(file_record["storage_path"])
+        # Stream the file from Supabase Storage so large PDFs spill to disk instead of RAM
+        try:
+            download = call_supabase(_download_to_spool, supa, file_record["storage_path"], f"{file_id}.pdf")
+        except Exception as e:
+            logger.error("❌ Storage download failed for file %s: %s", file_id, e)
+            download = None
 
-        if not download_response:
-            get_supabase_admin().table("files").update({
+        if not download:
+            wait([processing_update])
+            _update_file(file_id, {
                 "status": "failed",
                 "error_message": "Failed to download file from storage",
-                "updated_at": datetime.utcnow().isoformat()
-            }).eq("id", file_id).execute()
+                "updated_at": datetime.now(timezone.utc).isoformat()
+            })
             return {"status": "error", "message": "Failed to download file"}
 
-        # Process with Docling
-        # Ensure we have a proper temp directory
-        temp_dir = os.environ.get('TMPDIR', '/tmp')
-        if not os.path.exists(temp_dir):
-            os.makedirs(temp_dir, exist_ok=True)
-        
-        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False, dir=temp_dir) as temp_file:
-            temp_file.write(download_response)
-            temp_file.flush()
+        # Process with Docling straight from the spooled download
+        try:
+            # Byte-identical re-uploads by the same user reuse earlier markdown instead of re-running Docling
+            content_hash = download.content_hash
+            cached = _find_cached_markdown(supa, file_record["user_id"], content_hash)
 
-            try:
-                print(f"📄 Processing PDF file: {temp_file.name}")
-                print(f"🗂️ Using temp directory: {temp_dir}")
-                
-                # Configure Docling to use CPU (no MPS)
-                accelerator_opts = AcceleratorOptions(
-                    num_threads=8,
-                    device=AcceleratorDevice.CPU
-                )
-                pdf_opts = PdfPipelineOptions()
-                pdf_opts.accelerator_options = accelerator_opts
-
-                converter = DocumentConverter(
-                    format_options={
-                        InputFormat.PDF: PdfFormatOption(pipeline_options=pdf_opts)
-                    }
-                )
-                
-                print("🤖 Starting Docling conversion...")
-                result = converter.convert(temp_file.name)
-                markdown_content = result.document.export_to_markdown()
-                print(f"✅ Conversion completed, generated {len(markdown_content)} characters")
-
-                # Save markdown content using service key
-                word_count = len(markdown_content.split())
-                markdown_data = {
-                    "file_id": file_id,
-                    "user_id": file_record["user_id"],
-                    "content": markdown_content,
-                    "word_count": word_count,
-                    "created_at": datetime.utcnow().isoformat(),
-                    "updated_at": datetime.utcnow().isoformat()
-                }
-
-                get_supabase_admin().table("markdown_content").insert(markdown_data).execute()
-
-                # Update file status to completed
-                get_supabase_admin().table("files").update({
-                    "status": "completed",
-                    "processed_at": datetime.utcnow().isoformat(),
-                    "updated_at": datetime.utcnow().isoformat()
-                }).eq("id", file_id).execute()
-
-                print(f"✅ Document processing completed successfully for file: {file_id}")
-                return {"status": "success", "word_count": word_count}
-
-            except Exception as e:
-                print(f"❌ Docling processing failed for file {file_id}: {str(e)}")
-                get_supabase_admin().table("files").update({
-                    "status": "failed",
-                    "error_message": str(e),
-                    "updated_at": datetime.utcnow().isoformat()
-                }).eq("id", file_id).execute()
-                return {"status": "error", "message": str(e)}
-
-            finally:
-                # Clean up temp file
-                try:
-                    os.unlink(temp_file.name)
-                    print(f"🗑️ Cleaned up temp file: {temp_file.name}")
-                except Exception as cleanup_error:
-                    print(f"⚠️ Failed to cleanup temp file: {cleanup_error}")
+            if cached:
+                logger.info("♻️ Reusing markdown of identical content for file: %s", file_id)
+                markdown_content = cached["content"]
+                word_count = cached["word_count"]
+            else:
+                logger.info("📄 Processing PDF file: %s.pdf", file_id)
+
+                logger.info("🤖 Starting Docling conversion...")
+                markdown_content = _convert_source(download.source)
+                logger.info("✅ Conversion completed, generated %d characters", len(markdown_content))
+                word_count = _count_words(markdown_content)
+            t_end = datetime.now(timezone.utc).isoformat()
+
+            # Make sure the processing write has landed before the terminal status
+            wait([processing_update])
+
+            # Save the markdown and complete the file in one transaction and round-trip;
+            # finalize_document upserts on file_id, so a retried call can't duplicate the row
+            execute_with_retry(supa.rpc("finalize_document", {
+                "p_file_id": file_id,
+                "p_user_id": file_record["user_id"],
+                "p_content": markdown_content,
+                "p_content_hash": content_hash,
+                "p_words": word_count,
+                "p_finished_at": t_end
+            }))
+
+            logger.info("✅ Document processing completed successfully for file: %s", file_id)
+            return {"status": "success", "word_count": word_count}
+
+        except Exception as e:
+            logger.error("❌ Docling processing failed for file %s: %s", file_id, e)
+            wait([processing_update])
+            _update_file(file_id, {
+                "status": "failed",
+                "error_message": str(e),
+                "updated_at": datetime.now(timezone.utc).isoformat()
+            })
+            return {"status": "error", "message": str(e)}
+
+        finally:
+            download.close()
 
     except Exception as e:
-        print(f"❌ Task failed for file {file_id}: {str(e)}")
+        logger.error("❌ Task failed for file %s: %s", file_id, e)
         # Update file status to failed if it exists
         try:
-            get_supabase_admin().table("files").update({
+            _update_file(file_id, {
                 "status": "failed",
                 "error_message": str(e),
-                "updated_at": datetime.utcnow().isoformat()
-            }).eq("id", file_id).execute()
+                "updated_at": datetime.now(timezone.utc).isoformat()
+            })
         except:
             pass
         return {"status": "error", "message": str(e)}
+
+
+def process_documents_batch(file_ids: list[str]):
+    """Fan out processing for several files so workers convert them in parallel.
+
+    Each task persists its own result through finalize_document, so one lost
+    task never holds back the rest of the batch.
+    """
+    return group(process_document_task.s(file_id) for file_id in file_ids).apply_async()